@@ -1,14 +1,36 @@
 import os
+import io
+import re
+import hashlib
+import functools
+import time
+import threading
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import cv2
+import numpy as np
 import speech_recognition as sr
 import google.generativeai as genai
-from PIL import Image
+from PIL import Image, ImageDraw, ImageFont
 from gtts import gTTS
-from langdetect import detect
-from playsound import playsound  # Windows native player
+from langdetect import detect, DetectorFactory
+import pygame
 from dotenv import load_dotenv
 import requests
-import json
+from requests.adapters import HTTPAdapter
+
+try:
+    # Optional: lets us stream audio to Google while the user is still speaking
+    from google.cloud import speech
+except ImportError:
+    speech = None
+
+try:
+    # Optional: voice activity detection, to stop recording as soon as the user goes quiet
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
 
 # Load variables from .env file
 load_dotenv()
@@ -22,19 +44,119 @@ if not API_KEY:
 
 genai.configure(api_key=API_KEY)
 recognizer = sr.Recognizer()
+# One audio device for everything: cues play on Sound channels, speech on mixer.music.
+pygame.mixer.init(frequency=22050)
+
+# Reuse one keep-alive connection to the local API instead of reconnecting per request
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+# --- Conversation State ---
+# Shared between the UI loop and the background question pipeline
+conversation_id = None # Server-side session ID of the conversation about the current image
+conversation_lock = threading.Lock()
+# Set when the user quits. A running executor task can't be killed, so background
+# work checks this between steps and stops instead of listening or speaking on.
+shutting_down = threading.Event()
+
+# --- Camera Capture ---
+MAX_IMAGE_EDGE = 768 # Frames are shrunk to this long edge before upload
+JPEG_QUALITY = 80 # Quality of the frames uploaded to the API
+
+# --- UI Overlay ---
+OVERLAY_HEIGHT, OVERLAY_WIDTH = 140, 400 # Size of the help text area in the top-left corner
+OVERLAY_FONT_SIZE = 20
+
+# --- Speech Recognition ---
+# Languages the user may speak, in order of preference
+LANGUAGES = ["ar-MA", "fr-FR", "en-US"]
+PHRASE_TIME_LIMIT = 6 # Seconds
+SPEECH_START_TIMEOUT = 5 # Seconds to wait for the user to start talking
+
+# Voice activity detection settings (only used when webrtcvad is installed)
+VAD_SAMPLE_RATE = 16000
+VAD_FRAME_MS = 20 # webrtcvad accepts 10, 20 or 30 ms frames
+VAD_SILENCE_MS = 300 # The phrase ends after this much silence
+VAD_PREROLL_MS = 200 # Audio kept from just before speech starts, so the first syllable isn't cut
+vad_enabled = webrtcvad is not None # Turned off if the microphone can't record at VAD_SAMPLE_RATE
+
+# Ambient noise calibration takes a full second, so we only redo it every few minutes.
+# In between, the recognizer's dynamic energy threshold (on by default) tracks the room.
+CALIBRATION_INTERVAL = 300 # Seconds
+last_calibration = None # time.time() of the last calibration, None until the first one
+
+# Streaming recognition needs Google Cloud credentials; without them we
+# fall back to recording the phrase and recognizing it afterwards.
+speech_client = None
+if speech:
+    try:
+        speech_client = speech.SpeechClient()
+    except Exception as e:
+        print(f"[Speech] Streaming recognition unavailable, using fallback: {e}")
+
+# Used to try every language at once in the fallback path
+recognition_pool = ThreadPoolExecutor(max_workers=len(LANGUAGES))
+
+# --- Safety Alerts ---
+# Responses starting with one of these get the warning cue
+ALERT_PREFIXES = ("warning:", "caution:", "danger:")
+ALERT_PREFIX_LENGTH = max(len(prefix) for prefix in ALERT_PREFIXES)
+
+# --- Text-to-Speech Cache ---
+TTS_CACHE_DIR = "tts_cache"
+TTS_CACHE_MAX_FILES = 200 # Least recently used clips are deleted beyond this
+TTS_PART_MAX_AGE = 60 # Seconds after which a leftover temporary clip is considered stale
+tts_cache_lock = threading.Lock() # Clips are generated on several threads at once
+
+# Responses are spoken sentence by sentence: the first sentence starts playing
+# while the following ones are still being generated.
+SENTENCE_END = re.compile(r"(?<=[.!?؟])\s+") # Includes the Arabic question mark
+tts_pool = ThreadPoolExecutor(max_workers=3)
+
+# langdetect is random by default; seed it so the same text always gets the same voice
+DetectorFactory.seed = 0
+
+# Language of the fixed UI phrases below, passed explicitly so they never go through detection
+UI_LANGUAGE = "en"
+
+# Fixed phrases spoken by the UI. They are synthesized once at startup so
+# even their first playback comes straight from the cache.
+PRELOADED_PHRASES = [
+    "System Ready.",
+    "Mode changed to general",
+    "Mode changed to street",
+    "Mode changed to kitchen",
+    "History cleared.",
+    "I didn't hear a question.",
+    "I didn't hear a follow-up question.",
+    "Please start a new conversation first by pressing the space bar.",
+    "Could not connect to the local API server. Is mobile.py running?",
+    "Sorry, I could not capture the image. Please try again.",
+]
 
 # --- Audio Cue Functions ---
-def play_sound(sound_file):
-    """Helper function to play a sound file from the 'sounds' directory."""
-    sound_path = os.path.join("sounds", sound_file)
-    try:
-        if os.path.exists(sound_path):
-            playsound(sound_path, block=False) # block=False lets the sound play in the background
-        else:
+def load_sounds():
+    """Decodes the cue sounds from the 'sounds' directory once, so they can play instantly."""
+    sounds = {}
+    for sound_file in ["thinking.mp3", "success.mp3", "warning.mp3"]:
+        sound_path = os.path.join("sounds", sound_file)
+        if not os.path.exists(sound_path):
             # This print is for the developer.
             print(f"[Audio Cue] Hint: Add a sound file at '{sound_path}'")
-    except Exception as e:
-        print(f"❌ Error playing sound {sound_path}: {e}")
+            continue
+        try:
+            sounds[sound_file] = pygame.mixer.Sound(sound_path)
+        except pygame.error as e:
+            print(f"❌ Error loading sound {sound_path}: {e}")
+    return sounds
+
+SOUNDS = load_sounds()
+
+def play_sound(sound_file):
+    """Helper function to play a preloaded cue sound in the background."""
+    sound = SOUNDS.get(sound_file)
+    if sound:
+        sound.play()
 
 def play_thinking_sound():
     """Plays a sound to indicate the AI is processing."""
@@ -51,79 +173,439 @@ def play_warning_sound():
     # Recommendation: A sharp, urgent but not alarming beep (e.g., warning.mp3)
     play_sound("warning.mp3")
 
-def speak(text):
+@functools.lru_cache(maxsize=256)
+def detect_prefix_language(prefix):
+    """Runs langdetect once per distinct text prefix."""
+    return detect(prefix)
+
+def detect_language(text):
+    """
+    Returns the gTTS language code to use for the given text.
+    Short text is assumed to be English; longer text is detected from its first 40 characters.
+    """
+    if len(text) < 20 or len(text.split()) < 2:
+        return 'en'
+    return detect_prefix_language(text[:40])
+
+def tts_cache_path(text, lang):
+    """Returns the cache file path for a (text, language) pair."""
+    key = hashlib.sha256(f"{lang}|{text}".strip().lower().encode()).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, f"{key}.mp3")
+
+def evict_tts_cache():
+    """
+    Deletes the least recently used clips once the cache grows past its cap,
+    along with temporary files left behind by an interrupted run.
+    """
+    with tts_cache_lock:
+        if not os.path.isdir(TTS_CACHE_DIR):
+            return
+
+        now = time.time()
+        for name in os.listdir(TTS_CACHE_DIR):
+            part_path = os.path.join(TTS_CACHE_DIR, name)
+            try:
+                if name.endswith(".part") and now - os.path.getmtime(part_path) > TTS_PART_MAX_AGE:
+                    os.remove(part_path)
+            except OSError:
+                pass # Already gone or still in use; it will go next time.
+
+        clips = [os.path.join(TTS_CACHE_DIR, f) for f in os.listdir(TTS_CACHE_DIR) if f.endswith(".mp3")]
+        if len(clips) <= TTS_CACHE_MAX_FILES:
+            return
+
+        clips.sort(key=os.path.getmtime, reverse=True)
+        for path in clips[TTS_CACHE_MAX_FILES:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass # The file may still be locked by the player; it will go next time.
+
+def cached_clip(text, lang):
+    """Returns the path of the cached clip for the text, or None on a cache miss."""
+    path = tts_cache_path(text, lang)
+    if os.path.exists(path):
+        os.utime(path) # Mark the clip as recently used
+        return path
+    return None
+
+def synthesize(text, lang):
+    """
+    Returns the path to an MP3 of the text, calling gTTS only on a cache miss.
+    """
+    path = cached_clip(text, lang)
+    if path:
+        return path
+    path = tts_cache_path(text, lang)
+
+    # Download into memory first, so a failed request never touches the cache directory
+    audio = io.BytesIO()
+    gTTS(text=text, lang=lang, slow=False).write_to_fp(audio)
+
+    os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+    # Then write to a temporary name so a half-written clip is never picked up.
+    # The thread ID keeps two threads generating the same sentence from clashing.
+    tmp_path = f"{path}.{threading.get_ident()}.part"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(audio.getbuffer())
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    evict_tts_cache()
+    return path
+
+def split_sentences(text):
+    """Splits text into sentences, the unit that speak() synthesizes and caches."""
+    return [sentence for sentence in SENTENCE_END.split(text.strip()) if sentence]
+
+def synthesize_clip(text, lang, cache):
+    """
+    Returns something play_audio() accepts: a cached file path, or an in-memory MP3.
+    With cache=False a sentence that is already on disk is still reused, but a new
+    one is kept in memory and never written to the cache.
+    """
+    if cache:
+        # Repeated sentences are kept on disk so gTTS only runs once for them
+        return synthesize(text, lang)
+
+    path = cached_clip(text, lang)
+    if path:
+        return path
+
+    audio = io.BytesIO()
+    gTTS(text=text, lang=lang, slow=False).write_to_fp(audio)
+    audio.seek(0)
+    return audio
+
+def preload_sentence(sentence):
+    """Synthesizes one UI sentence into the cache, reporting (not raising) failures."""
+    try:
+        synthesize(sentence, UI_LANGUAGE)
+    except Exception as e:
+        print(f"❌ Could not preload '{sentence}': {e}")
+
+def preload_tts_cache():
+    """
+    Starts synthesizing the fixed UI phrases in the background so they play instantly later.
+
+    Returns:
+        A dict mapping each sentence to the future of its preload.
+    """
+    tts_pool.submit(evict_tts_cache) # Also sweeps temp files left by a previous run
+    futures = {}
+    for phrase in PRELOADED_PHRASES:
+        for sentence in split_sentences(phrase):
+            futures[sentence] = tts_pool.submit(preload_sentence, sentence)
+    return futures
+
+def play_audio(source):
+    """Plays an MP3 from a file path or file-like object and waits until it finishes."""
+    pygame.mixer.music.load(source, namehint="mp3")
+    pygame.mixer.music.play()
+    while pygame.mixer.music.get_busy():
+        if shutting_down.is_set():
+            pygame.mixer.music.stop()
+            break
+        pygame.time.wait(50)
+    pygame.mixer.music.unload() # Release the file so the cache can evict it later
+
+def speak(text, lang=None, cache=True):
     if not text: return
 
     # Play a warning sound if the response contains a safety alert.
-    text_lower = text.lower()
-    if text_lower.startswith("warning:") or text_lower.startswith("caution:") or text_lower.startswith("danger:"):
+    # Only the first few characters matter, so there's no need to lowercase the whole text.
+    if text[:ALERT_PREFIX_LENGTH].lower().startswith(ALERT_PREFIXES):
         play_warning_sound()
 
     print(f"🗣️ Speaking: {text}")
     
     try:
-        # Detect Language
-        lang = detect(text) if len(text.split()) > 1 else 'en'
-        
-        # Generate MP3
-        filename = "response.mp3"
-        # Remove old file if it exists (Windows locks files sometimes)
-        if os.path.exists(filename):
-            os.remove(filename)
-            
-        tts = gTTS(text=text, lang=lang, slow=False)
-        tts.save(filename)
+        # Detect Language (unless the API already told us)
+        lang = lang or detect_language(text)
         
-        # Play Sound (Native Windows)
-        playsound(filename)
+        # Generate all sentences in the background and play each one as soon as it is ready.
+        # Cached sentences skip the pool, so they never queue behind other synthesis.
+        clips = []
+        for sentence in split_sentences(text):
+            path = cached_clip(sentence, lang)
+            clips.append(path if path else tts_pool.submit(synthesize_clip, sentence, lang, cache))
+        for clip in clips:
+            if shutting_down.is_set():
+                break
+            play_audio(clip if isinstance(clip, str) else clip.result())
         
     except Exception as e:
         print(f"❌ Audio Error: {e}")
 
+def listen_streaming():
+    """
+    Streams microphone audio to Google Cloud Speech while the user is talking.
+    All languages are detected in a single request, and we return as soon as
+    Google reports a final result.
+    """
+    with sr.Microphone() as source:
+        config = speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=source.SAMPLE_RATE,
+                language_code=LANGUAGES[0],
+                alternative_language_codes=LANGUAGES[1:],
+            ),
+            single_utterance=True, # Google ends the stream once the user stops talking
+        )
+        max_chunks = int(PHRASE_TIME_LIMIT * source.SAMPLE_RATE / source.CHUNK)
+        chunks = queue.Queue()
+        stop = threading.Event()
+
+        def read_microphone():
+            # Runs on a thread we own, so we can wait for it before the microphone is closed
+            try:
+                for _ in range(max_chunks):
+                    if stop.is_set():
+                        break
+                    chunks.put(source.stream.read(source.CHUNK))
+            finally:
+                chunks.put(None) # Tells audio_chunks() the recording is over, even if a read failed
+
+        def audio_chunks():
+            # gRPC consumes this on its own thread; it never touches the microphone itself
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    return
+                yield speech.StreamingRecognizeRequest(audio_content=chunk)
+
+        reader = threading.Thread(target=read_microphone, daemon=True)
+        reader.start()
+        responses = None
+
+        print("   -> Speak NOW!")
+        try:
+            responses = speech_client.streaming_recognize(config=config, requests=audio_chunks())
+            for response in responses:
+                if response.speech_event_type == speech.StreamingRecognizeResponse.SpeechEventType.END_OF_SINGLE_UTTERANCE:
+                    stop.set() # No need to send more audio
+                for result in response.results:
+                    if result.is_final and result.alternatives:
+                        text = result.alternatives[0].transcript
+                        print(f"✅ Detected ({result.language_code}): {text}")
+                        return text
+        finally:
+            # Finish the last microphone read before the stream gets closed
+            stop.set()
+            reader.join()
+            if responses is not None:
+                responses.cancel() # Close the RPC if we returned before Google did
+
+    print("Could not understand audio")
+    return ""
+
+def recognize_all_languages(audio):
+    """
+    Sends the recorded audio to Google once per language, all at the same time,
+    and returns the transcript of the most preferred language that was understood.
+    """
+    futures = [recognition_pool.submit(recognizer.recognize_google, audio, language=lang) for lang in LANGUAGES]
+
+    for lang, future in zip(LANGUAGES, futures):
+        try:
+            text = future.result()
+            print(f"✅ Detected ({lang}): {text}")
+            return text
+        except sr.UnknownValueError:
+            # This means speech was heard but not understood
+            continue # Try the next language
+        except sr.RequestError as e:
+            # This means there was an issue with the API request
+            print(f"Could not request results from Google Speech Recognition service; {e}")
+            return "" # Stop trying
+
+    # If the loop finishes without returning, nothing was recognized
+    print("Could not understand audio")
+    return ""
+
+def record_with_vad():
+    """
+    Records one phrase in 20 ms frames and stops shortly after the user goes quiet,
+    instead of waiting out the phrase time limit.
+
+    Returns:
+        The recorded sr.AudioData, or None if the user never started talking.
+    """
+    vad = webrtcvad.Vad(3) # Most aggressive at filtering out non-speech
+    frame_samples = VAD_SAMPLE_RATE * VAD_FRAME_MS // 1000
+    max_wait_frames = SPEECH_START_TIMEOUT * 1000 // VAD_FRAME_MS
+    max_phrase_frames = PHRASE_TIME_LIMIT * 1000 // VAD_FRAME_MS
+    silence_frames = VAD_SILENCE_MS // VAD_FRAME_MS
+
+    with sr.Microphone(sample_rate=VAD_SAMPLE_RATE, chunk_size=frame_samples) as source:
+        print("   -> Speak NOW!")
+        preroll = deque(maxlen=VAD_PREROLL_MS // VAD_FRAME_MS)
+
+        # Wait for the user to start talking
+        for _ in range(max_wait_frames):
+            frame = source.stream.read(frame_samples)
+            if vad.is_speech(frame, VAD_SAMPLE_RATE):
+                break
+            preroll.append(frame)
+        else:
+            return None
+
+        # Record until enough silence follows the speech
+        frames = list(preroll) + [frame]
+        silent = 0
+        while len(frames) < max_phrase_frames and silent < silence_frames:
+            frame = source.stream.read(frame_samples)
+            frames.append(frame)
+            silent = 0 if vad.is_speech(frame, VAD_SAMPLE_RATE) else silent + 1
+
+        return sr.AudioData(b"".join(frames), VAD_SAMPLE_RATE, source.SAMPLE_WIDTH)
+
 def listen_to_user():
+    global last_calibration, vad_enabled
     print("👂 Listening... (Speak now!)")
     try:
-        with sr.Microphone() as source: 
-            recognizer.adjust_for_ambient_noise(source, duration=1.0)
-            print("   -> Speak NOW!")
-            audio = recognizer.listen(source, timeout=5, phrase_time_limit=6)
-            
-            # List of languages to try in order
-            languages = ["ar-MA", "fr-FR", "en-US"]
-            
-            for lang in languages:
-                try:
-                    text = recognizer.recognize_google(audio, language=lang)
-                    print(f"✅ Detected ({lang}): {text}")
-                    return text
-                except sr.UnknownValueError:
-                    # This means speech was heard but not understood
-                    continue # Try the next language
-                except sr.RequestError as e:
-                    # This means there was an issue with the API request
-                    print(f"Could not request results from Google Speech Recognition service; {e}")
-                    return "" # Stop trying
-            
-            # If the loop finishes without returning, nothing was recognized
-            print("Could not understand audio")
-            return ""
+        if speech_client:
+            return listen_streaming()
+
+        audio = None
+        if vad_enabled:
+            try:
+                audio = record_with_vad()
+            except OSError as e:
+                # Usually the input device rejecting 16 kHz; the plain recorder below still works
+                print(f"[Speech] Voice activity detection unavailable, using fallback: {e}")
+                vad_enabled = False
+            else:
+                if audio is None:
+                    print("No speech detected")
+                    return ""
+
+        if audio is None:
+            with sr.Microphone() as source: 
+                if last_calibration is None or time.time() - last_calibration > CALIBRATION_INTERVAL:
+                    recognizer.adjust_for_ambient_noise(source, duration=1.0)
+                    last_calibration = time.time()
+                print("   -> Speak NOW!")
+                audio = recognizer.listen(source, timeout=SPEECH_START_TIMEOUT, phrase_time_limit=PHRASE_TIME_LIMIT)
+
+        return recognize_all_languages(audio)
 
     except Exception as e:
         print(f"⚠️ Mic Error: {e}")
         return ""
 
-def analyze_image(image_path, user_question, mode="general", history=None):
+class FrameGrabber(threading.Thread):
+    """
+    Reads the camera on a background thread and keeps only the latest frame,
+    so the UI loop never waits on the camera driver.
+    """
+    def __init__(self, cap):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.frame = None
+        self.frame_id = 0 # Incremented for every new frame, so readers can skip repeats
+        self.lock = threading.Lock()
+        self.running = True
+
+    def run(self):
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.running = False
+                break
+            with self.lock:
+                self.frame = frame
+                self.frame_id += 1
+
+    def read_new(self, last_frame_id):
+        """
+        Returns (frame_id, copy of the latest frame) if a frame newer than last_frame_id
+        has arrived, or (last_frame_id, None) otherwise, without copying anything.
+        """
+        with self.lock:
+            if self.frame_id == last_frame_id:
+                return last_frame_id, None
+            return self.frame_id, self.frame.copy()
+
+    def read(self):
+        """Returns a copy of the latest frame, or None if none has arrived yet."""
+        with self.lock:
+            return None if self.frame is None else self.frame.copy()
+
+    def stop(self):
+        """Stops the grabber and waits for its last camera read to finish."""
+        self.running = False
+        self.join()
+
+def load_overlay_font():
+    """
+    Returns Arial (always present on Windows) or DejaVu Sans (common on Linux) at
+    OVERLAY_FONT_SIZE, falling back to Pillow's built-in font.
+    """
+    for font_name in ["arial.ttf", "DejaVuSans.ttf"]:
+        try:
+            return ImageFont.truetype(font_name, OVERLAY_FONT_SIZE)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=OVERLAY_FONT_SIZE) # Scalable since Pillow 10.1
+    except TypeError:
+        return ImageFont.load_default() # Older Pillow: small bitmap font
+
+def render_overlay(mode_name, font):
+    """
+    Renders the help text for one mode with PIL. This is done once per mode at startup.
+
+    Returns:
+        A tuple of (bgr, mask): the text colors as a BGR image, and a mask of the
+        pixels covered by text, ready to be blended onto each frame.
+    """
+    lines = [
+        (f"MODE: {mode_name.upper()} (1,2,3)", (0, 255, 0)),
+        ("SPACE: New Question", (255, 255, 255)),
+        ("F: Follow-up Question", (255, 255, 255)),
+        ("Q: Quit", (255, 255, 255)),
+    ]
+    overlay = Image.new("RGBA", (OVERLAY_WIDTH, OVERLAY_HEIGHT), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    for i, (text, color) in enumerate(lines):
+        # A dark outline keeps the text readable over any background
+        draw.text((10, 12 + 30 * i), text, font=font, fill=color + (255,), stroke_width=2, stroke_fill=(0, 0, 0, 255))
+
+    pixels = cv2.cvtColor(np.array(overlay), cv2.COLOR_RGBA2BGRA)
+    return pixels[:, :, :3], pixels[:, :, 3:] > 0
+
+def encode_frame(frame):
+    """
+    Shrinks a camera frame to the model's input size and JPEG-encodes it in memory.
+    Returns the JPEG bytes, or None if encoding failed.
+    """
+    height, width = frame.shape[:2]
+    scale = MAX_IMAGE_EDGE / max(height, width)
+    if scale < 1:
+        frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    return buf.tobytes() if ok else None
+
+def analyze_image(image_bytes, user_question, mode="general", session_id=None):
     """
     Analyzes an image by sending a request to the local Flask API server.
 
     Args:
-        image_path: The path to the image file (only for the first turn).
+        image_bytes: The JPEG-encoded image (only for the first turn).
         user_question: The question from the user.
         mode: The analysis mode (e.g., "general", "street", "kitchen").
-        history: The conversation history object from a previous turn.
+        session_id: The session ID returned by a previous turn (only for follow-ups).
 
     Returns:
-        A tuple of (text_response, updated_history).
+        A tuple of (text_response, session_id, language), where language is
+        the response's language code as detected by the server (English for local
+        error messages), or None if unknown.
     """
     API_URL = "http://127.0.0.1:5000/analyze"
     print(f"📡 Sending request to local API in '{mode}' mode...")
@@ -135,37 +617,96 @@ def analyze_image(image_path, user_question, mode="general", history=None):
     files = {}
 
     try:
-        # If there's no history, it's a new conversation with an image.
-        if not history:
-            if not image_path or not os.path.exists(image_path):
-                raise ValueError("Image path is required for a new conversation.")
+        # If there's no session, it's a new conversation with an image.
+        if not session_id:
+            if not image_bytes:
+                raise ValueError("Image bytes are required for a new conversation.")
             # The 'files' dictionary is used by requests to send multipart/form-data
-            files["image"] = (image_path, open(image_path, "rb"), "image/jpeg")
-        # If there is history, it's a follow-up. Send the history as a JSON string.
+            files["image"] = ("capture.jpg", io.BytesIO(image_bytes), "image/jpeg")
+        # If there is a session, it's a follow-up. The server keeps the history.
         else:
-            payload["history"] = json.dumps(history)
+            payload["session_id"] = session_id
 
-        response = requests.post(API_URL, data=payload, files=files)
+        response = SESSION.post(API_URL, data=payload, files=files)
+        if response.status_code == 404:
+            # The server forgot this conversation (restart or timeout)
+            return "This conversation has expired. Please press the space bar to start a new one.", None, UI_LANGUAGE
         response.raise_for_status()  # Raises an exception for bad status codes (4xx or 5xx)
 
-        # Close the file if it was opened
-        if "image" in files:
-            files["image"][1].close()
-
         # Parse the JSON response from the server
         data = response.json()
-        return data.get("result", "No result found."), data.get("history", [])
+        return data.get("result", "No result found."), data.get("session_id"), data.get("lang")
 
     except requests.exceptions.RequestException as e:
         print(f"❌ API Request Error: {e}")
         error_message = "Could not connect to the local API server. Is mobile.py running?"
-        speak(error_message)
-        return error_message, history # Return old history on error
+        speak(error_message, lang=UI_LANGUAGE)
+        return error_message, session_id, UI_LANGUAGE # Keep the old session on error
     except Exception as e:
         print(f"❌ An unexpected error occurred: {e}")
-        return f"An unexpected error occurred: {e}", history
+        return f"An unexpected error occurred: {e}", session_id, UI_LANGUAGE
+
+def run_question_pipeline(image_future, mode):
+    """
+    Handles one question from start to finish: listen, ask the API, speak the answer.
+    Runs on a worker thread so the camera preview keeps updating meanwhile.
+
+    Args:
+        image_future: A future resolving to the JPEG-encoded frame for a new conversation,
+                      or None for a follow-up. The frame is encoded while we listen.
+        mode: The analysis mode (e.g., "general", "street", "kitchen").
+    """
+    global conversation_id
+    is_follow_up = image_future is None
+
+    question = listen_to_user()
+    if shutting_down.is_set():
+        return
+    if not question:
+        if is_follow_up:
+            print("🤷 No question heard for follow-up.")
+            speak("I didn't hear a follow-up question.", lang=UI_LANGUAGE)
+        else:
+            print("🤷 No question heard.")
+            speak("I didn't hear a question.", lang=UI_LANGUAGE)
+        return
+
+    image_bytes = None if is_follow_up else image_future.result()
+    if not is_follow_up and not image_bytes:
+        print("❌ Could not encode the camera frame.")
+        speak("Sorry, I could not capture the image. Please try again.", lang=UI_LANGUAGE)
+        return
+
+    with conversation_lock:
+        session_id = conversation_id if is_follow_up else None
+
+    # We have a question: the cue plays in the background while Gemini works on it
+    play_thinking_sound()
+    result, session_id, lang = analyze_image(image_bytes, question, mode=mode, session_id=session_id)
+    play_success_sound()
+
+    with conversation_lock:
+        conversation_id = session_id
+    if shutting_down.is_set():
+        return
+    print(f"🤖 Gemini: {result}")
+    speak(result, lang=lang, cache=False) # One-off responses stay in memory
+
+def announce_mode_change(mode_name):
+    """Tells the user the new mode. Runs on a worker thread, like the question pipeline."""
+    speak(f"Mode changed to {mode_name}", lang=UI_LANGUAGE)
+    speak("History cleared.", lang=UI_LANGUAGE)
+
+def announce_ready(preloads):
+    """Says "System Ready." as soon as its own clip has been preloaded."""
+    ready = preloads.get("System Ready.")
+    if ready:
+        ready.result()
+    speak("System Ready.", lang=UI_LANGUAGE)
 
 def main():
+    global conversation_id
+
     # Windows Camera Index:
     cap = cv2.VideoCapture(0) 
     if not cap.isOpened():
@@ -177,28 +718,57 @@ def main():
     # --- State Management ---
     modes = {'1': "general", '2': "street", '3': "kitchen"}
     current_mode_key = '1'
-    chat_history = None # To store the conversation history for the current image
+    font = load_overlay_font()
+    overlays = {key: render_overlay(name, font) for key, name in modes.items()}
+    executor = ThreadPoolExecutor(max_workers=2)
+    pending = None # The question or announcement currently being handled in the background
+
+    # Preloading runs in the background so the camera preview appears right away
+    preloads = preload_tts_cache()
+
+    grabber = FrameGrabber(cap)
+    grabber.start()
 
     print("--- GEMINI VISION WINDOWS READY ---")
-    speak("System Ready.")
+    pending = executor.submit(announce_ready, preloads)
 
-    while True:
-        ret, frame = cap.read()
-        if not ret: break
+    last_frame_id = 0
+    while grabber.running:
+        frame_id, frame = grabber.read_new(last_frame_id)
+        if frame is None and last_frame_id == 0:
+            time.sleep(0.01) # The camera hasn't delivered its first frame yet
+            continue
 
-        # --- UI Display ---
-        mode_name = modes[current_mode_key].upper()
-        cv2.putText(frame, f"MODE: {mode_name} (1,2,3)", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        cv2.putText(frame, "SPACE: New Question", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        cv2.putText(frame, "F: Follow-up Question", (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        cv2.putText(frame, "Q: Quit", (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        busy = pending is not None and not pending.done()
+        if pending is not None and not busy:
+            if pending.exception():
+                print(f"❌ Pipeline Error: {pending.exception()}")
+            pending = None
 
-        cv2.imshow("Gemini Vision", frame)
+        # --- UI Display ---
+        # Only redraw when the camera has delivered a new frame
+        if frame is not None:
+            last_frame_id = frame_id
+            overlay_bgr, overlay_mask = overlays[current_mode_key]
+            height = min(OVERLAY_HEIGHT, frame.shape[0])
+            width = min(OVERLAY_WIDTH, frame.shape[1])
+            region = frame[:height, :width]
+            frame[:height, :width] = np.where(overlay_mask[:height, :width], overlay_bgr[:height, :width], region)
+            if busy:
+                cv2.putText(frame, "PROCESSING...", (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+
+            cv2.imshow("Gemini Vision", frame)
         
         key = cv2.waitKey(1) & 0xFF
 
         if key == ord('q'):
             break
+
+        # Only one task at a time; it is using the mic and speakers.
+        if busy:
+            if key != 255: # 255 means no key was pressed
+                print("⏳ Still working on the last question...")
+            continue
         
         # --- Mode Selection ---
         key_char = chr(key)
@@ -207,47 +777,34 @@ def main():
                 current_mode_key = key_char
                 new_mode_name = modes[current_mode_key]
                 print(f"🔄 Mode changed to: {new_mode_name}")
-                speak(f"Mode changed to {new_mode_name}")
-                chat_history = None # Reset history on mode change
-                speak("History cleared.")
+                with conversation_lock:
+                    conversation_id = None # Reset history on mode change
+                pending = executor.submit(announce_mode_change, new_mode_name)
 
         elif key == 32: # SPACE BAR for new question
             print("\n--- NEW QUESTION ---")
-            chat_history = None 
-            cv2.imwrite("capture.jpg", frame)
-            question = listen_to_user()
-            
-            if question:
-                play_thinking_sound()
-                result, history = analyze_image("capture.jpg", question, mode=modes[current_mode_key])
-                play_success_sound()
-                chat_history = history 
-                print(f"🤖 Gemini: {result}")
-                speak(result)
-            else:
-                print("🤷 No question heard.")
-                speak("I didn't hear a question.")
+            with conversation_lock:
+                conversation_id = None 
+            # Grab a fresh copy so the UI overlay isn't sent to Gemini, and encode
+            # it in memory on a worker thread while the pipeline starts listening.
+            encoding = executor.submit(encode_frame, grabber.read())
+            pending = executor.submit(run_question_pipeline, encoding, modes[current_mode_key])
 
         elif key == ord('f'): # 'F' for follow-up
-            if not chat_history:
+            with conversation_lock:
+                has_conversation = conversation_id is not None
+            if not has_conversation:
                 print("❌ No active conversation. Press SPACE to start a new one.")
-                speak("Please start a new conversation first by pressing the space bar.")
+                pending = executor.submit(speak, "Please start a new conversation first by pressing the space bar.", lang=UI_LANGUAGE)
                 continue
             
             print("\n--- FOLLOW-UP QUESTION ---")
-            question = listen_to_user()
-
-            if question:
-                play_thinking_sound()
-                result, history = analyze_image(None, question, mode=modes[current_mode_key], history=chat_history)
-                play_success_sound()
-                chat_history = history 
-                print(f"🤖 Gemini: {result}")
-                speak(result)
-            else:
-                print("🤷 No question heard for follow-up.")
-                speak("I didn't hear a follow-up question.")
+            pending = executor.submit(run_question_pipeline, None, modes[current_mode_key])
 
+    # Ask any running task to wrap up; the process exits once it has.
+    shutting_down.set()
+    executor.shutdown(wait=False)
+    grabber.stop()
     cap.release()
     cv2.destroyAllWindows()
 
@@ -3,8 +3,12 @@ from PIL import Image
 import google.generativeai as genai
 from flask import Flask, request, jsonify
 from dotenv import load_dotenv
-import json
-import io
+from waitress import serve
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from langdetect import detect, DetectorFactory, LangDetectException
 
 # --- SETUP ---
 load_dotenv()
@@ -15,6 +19,79 @@ if not API_KEY:
     raise ValueError("API key not found. Please create a .env file and add GEMINI_API_KEY.")
 
 genai.configure(api_key=API_KEY)
+# Created once and shared by all requests; each request starts its own chat.
+MODEL = genai.GenerativeModel('gemini-1.5-flash-latest')
+
+# Images are shrunk to this long edge before being sent to Gemini.
+# Larger images only cost more upload time and image tokens.
+MAX_IMAGE_EDGE = 768
+
+# System prompts for each analysis mode, built once at import time.
+PROMPTS = {
+    "street": """IMPORTANT: You are a safety assistant for a visually impaired user who is outdoors.
+1.  **Safety First:** Prioritize identifying immediate dangers like moving vehicles, cyclists, traffic lights, crosswalks, uneven pavement, and obstacles on the path.
+2.  **Warn Clearly:** If a danger is detected, begin with a clear warning (e.g., "Warning: Car approaching from the left.").
+3.  **Answer the Question:** After warnings, answer the user's question in the context of being on a street.
+""",
+    "kitchen": """IMPORTANT: You are a safety assistant for a visually impaired user in a kitchen.
+1.  **Safety First:** Prioritize identifying immediate dangers like hot surfaces (stoves, ovens), sharp objects (knives), open flames, and spills on the floor.
+2.  **Warn Clearly:** If a danger is detected, begin with a clear warning (e.g., "Caution: A sharp knife is on the counter to your right.").
+3.  **Answer the Question:** After warnings, answer the user's question in the context of a kitchen environment.
+""",
+    "general": """IMPORTANT: Your primary role is to be a safety assistant for a visually impaired user.
+1.  **Safety First:** Meticulously analyze the image for any potential hazards. This includes, but is not limited to: obstacles on the ground, stairs, or sudden drops.
+2.  **Warn Clearly:** If a danger is detected, begin your response with a clear, direct warning.
+3.  **Answer the Question:** After issuing any necessary warnings, then proceed to answer the user's question.
+"""
+}
+
+DetectorFactory.seed = 0 # Make language detection deterministic
+
+def detect_language(text):
+    """
+    Returns the language code of a response so clients don't have to detect it themselves.
+    Falls back to English for text that is too short or ambiguous.
+    """
+    if len(text.split()) < 2:
+        return "en"
+    try:
+        return detect(text)
+    except LangDetectException:
+        return "en"
+
+# --- Conversation Sessions ---
+# Chat histories stay on the server; clients only hold an opaque session ID.
+MAX_SESSIONS = 100
+SESSION_TTL = 30 * 60 # Seconds of inactivity before a conversation is forgotten
+SESSIONS = OrderedDict() # session_id -> (last_used, history), least recently used first
+sessions_lock = threading.Lock() # Waitress handles requests on several threads
+
+def save_session(session_id, history):
+    """Stores a conversation and evicts expired or least recently used ones."""
+    now = time.time()
+    with sessions_lock:
+        SESSIONS[session_id] = (now, history)
+        SESSIONS.move_to_end(session_id)
+        while SESSIONS:
+            last_used, _ = next(iter(SESSIONS.values()))
+            if len(SESSIONS) <= MAX_SESSIONS and now - last_used <= SESSION_TTL:
+                break
+            SESSIONS.popitem(last=False)
+
+def load_session(session_id):
+    """
+    Returns the history of a conversation, or None if it is unknown or expired.
+    Loading counts as activity, so a conversation in use never times out.
+    """
+    now = time.time()
+    with sessions_lock:
+        entry = SESSIONS.get(session_id)
+        if entry is None or now - entry[0] > SESSION_TTL:
+            return None
+        history = entry[1]
+        SESSIONS[session_id] = (now, history)
+        SESSIONS.move_to_end(session_id)
+        return history
 
 # --- FLASK APP ---
 app = Flask(__name__)
@@ -29,12 +106,12 @@ def index():
         "usage": "Send a POST request to /analyze with an 'image' file and a 'question' form field."
     })
 
-def analyze_image(image_bytes, user_question, mode="general", history=None):
+def analyze_image(image_stream, user_question, mode="general", history=None):
     """
     Analyzes an image using a conversational chat session with Gemini.
 
     Args:
-        image_bytes: The image data in bytes (only for the first turn).
+        image_stream: A file-like object with the image data (only for the first turn).
         user_question: The question from the user.
         mode: The analysis mode (e.g., "general", "street", "kitchen").
         history: The conversation history from previous turns.
@@ -44,35 +121,20 @@ def analyze_image(image_bytes, user_question, mode="general", history=None):
     """
     print(f"🧠 Gemini is thinking in '{mode}' mode...")
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash-latest')
-        chat = model.start_chat(history=history or [])
+        chat = MODEL.start_chat(history=history or [])
 
         # If this is the first question, we build the detailed system prompt.
         # Otherwise, for follow-ups, we just send the new question.
         if not history:
-            if not image_bytes:
-                raise ValueError("Image bytes are required for a new conversation.")
+            if not image_stream:
+                raise ValueError("An image is required for a new conversation.")
             
-            img = Image.open(io.BytesIO(image_bytes))
+            # Decode straight from the upload stream without buffering a copy first
+            img = Image.open(image_stream)
+            img.load()
+            img.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE), Image.LANCZOS)
             
-            prompts = {
-                "street": """IMPORTANT: You are a safety assistant for a visually impaired user who is outdoors.
-1.  **Safety First:** Prioritize identifying immediate dangers like moving vehicles, cyclists, traffic lights, crosswalks, uneven pavement, and obstacles on the path.
-2.  **Warn Clearly:** If a danger is detected, begin with a clear warning (e.g., "Warning: Car approaching from the left.").
-3.  **Answer the Question:** After warnings, answer the user's question in the context of being on a street.
-""",
-                "kitchen": """IMPORTANT: You are a safety assistant for a visually impaired user in a kitchen.
-1.  **Safety First:** Prioritize identifying immediate dangers like hot surfaces (stoves, ovens), sharp objects (knives), open flames, and spills on the floor.
-2.  **Warn Clearly:** If a danger is detected, begin with a clear warning (e.g., "Caution: A sharp knife is on the counter to your right.").
-3.  **Answer the Question:** After warnings, answer the user's question in the context of a kitchen environment.
-""",
-                "general": """IMPORTANT: Your primary role is to be a safety assistant for a visually impaired user.
-1.  **Safety First:** Meticulously analyze the image for any potential hazards. This includes, but is not limited to: obstacles on the ground, stairs, or sudden drops.
-2.  **Warn Clearly:** If a danger is detected, begin your response with a clear, direct warning.
-3.  **Answer the Question:** After issuing any necessary warnings, then proceed to answer the user's question.
-"""
-            }
-            base_prompt = prompts.get(mode, prompts["general"])
+            base_prompt = PROMPTS.get(mode, PROMPTS["general"])
             final_prompt = f"{base_prompt}\nUser's question: \"{user_question}\""
             response = chat.send_message([final_prompt, img])
         else:
@@ -95,7 +157,8 @@ def handle_analysis():
     - 'question': The user's question.
     - 'mode' (optional): The analysis mode.
     - EITHER 'image' (for a new conversation) 
-    - OR 'history' (for a follow-up, as a JSON string).
+    - OR 'session_id' (for a follow-up, as returned by the previous turn).
+    Responds with the 'result' text, its 'lang' and the conversation's 'session_id'.
     """
     # --- Input Validation ---
     if 'question' not in request.form:
@@ -103,26 +166,33 @@ def handle_analysis():
 
     question = request.form['question']
     mode = request.form.get('mode', 'general')
-    history_str = request.form.get('history')
-    history = json.loads(history_str) if history_str else None
+    session_id = request.form.get('session_id')
 
     try:
-        # Case 1: New conversation (no history provided)
-        if not history:
+        # Case 1: New conversation (no session ID provided)
+        if not session_id:
             if 'image' not in request.files:
                 return jsonify({"error": "No image file provided for a new conversation."}), 400
             
-            image_file = request.files['image']
-            image_bytes = image_file.stream.read()
+            image_stream = request.files['image'].stream
             
-            result, updated_history = analyze_image(image_bytes, question, mode, history=None)
-            return jsonify({"result": result, "history": updated_history})
+            result, updated_history = analyze_image(image_stream, question, mode, history=None)
+            # Only start a session if Gemini actually answered
+            session_id = uuid.uuid4().hex if updated_history else None
 
-        # Case 2: Follow-up conversation (history provided)
+        # Case 2: Follow-up conversation (session ID provided)
         else:
+            history = load_session(session_id)
+            if history is None:
+                return jsonify({"error": "Unknown or expired session. Please start a new conversation."}), 404
+
             # Image is not needed as it's in the history
             result, updated_history = analyze_image(None, question, mode, history=history)
-            return jsonify({"result": result, "history": updated_history})
+
+        # On a failed follow-up the stored history is kept, so the user can simply ask again.
+        if updated_history:
+            save_session(session_id, updated_history)
+        return jsonify({"result": result, "session_id": session_id, "lang": detect_language(result)})
         
     except Exception as e:
         print(f"❌ SERVER ERROR: {e}")
@@ -137,7 +207,8 @@ def main():
     print("--- Ready to receive requests ---")
     # To run on your local network, use host='0.0.0.0'
     # The app will be available at http://<your-ip-address>:5000
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Waitress serves requests on a thread pool, so several clients can wait on Gemini at once.
+    serve(app, host='0.0.0.0', port=5000, threads=8)
 
 if __name__ == "__main__":
     main()
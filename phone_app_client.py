@@ -1,13 +1,17 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
 import os
 
 # The address of our local Flask API server.
 # Make sure mobile.py is running in a separate terminal for this to work.
 API_URL = "http://127.0.0.1:5000/analyze"
 
-# The image captured by main.py. We'll use it as our sample image.
-# In a real mobile app, this would come from the phone's camera.
+# Both turns share one keep-alive connection, like a real app would.
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+# A sample photo to send. main.py no longer saves its captures, so put any
+# JPEG here. In a real mobile app, this would come from the phone's camera.
 IMAGE_PATH = "capture.jpg"
 
 def run_phone_simulation():
@@ -19,7 +23,7 @@ def run_phone_simulation():
     # --- Check if the sample image exists ---
     if not os.path.exists(IMAGE_PATH):
         print(f"Error: Sample image '{IMAGE_PATH}' not found.")
-        print("Please run main.py and press SPACE to capture an image first.")
+        print("Please save a photo (JPEG) at that path first.")
         return
 
     # --- 1. First Turn (New Conversation with an Image) ---
@@ -34,40 +38,41 @@ def run_phone_simulation():
             files1 = {"image": (IMAGE_PATH, image_file, "image/jpeg")}
             
             # This is where a real mobile app would make its network request.
-            response1 = requests.post(API_URL, data=payload1, files=files1)
+            response1 = SESSION.post(API_URL, data=payload1, files=files1)
             response1.raise_for_status()
 
         data1 = response1.json()
         result1 = data1.get("result")
-        history1 = data1.get("history") # Save the history for the follow-up
+        session_id = data1.get("session_id") # Save the session for the follow-up
 
         print(f"\n🤖 Server Response: '{result1}'")
-        print("✅ First turn successful. History has been saved.")
+        print("✅ First turn successful. Session has been saved.")
 
     except requests.exceptions.RequestException as e:
         print(f"❌ API Request Error: {e}")
         print("Could not connect to the local API server. Is mobile.py running?")
         return
 
-    # --- 2. Second Turn (Follow-up Question with History) ---
-    if not history1:
-        print("\nCould not proceed to follow-up, history is empty.")
+    # --- 2. Second Turn (Follow-up Question in the same Session) ---
+    if not session_id:
+        print("\nCould not proceed to follow-up, no session was started.")
         return
 
     print("\n----------------------------------")
     print("2. Asking a follow-up question...")
 
     question2 = "What color is the largest object?"
-    # In a follow-up, we don't need to send the image again, just the history.
+    # In a follow-up, we don't need to send the image again, just the session ID.
+    # The server keeps the conversation history.
     payload2 = {
         "question": question2,
         "mode": mode1, # Usually the mode would be the same
-        "history": json.dumps(history1) # The history must be sent as a JSON string
+        "session_id": session_id
     }
 
     try:
         # This is the second network request.
-        response2 = requests.post(API_URL, data=payload2)
+        response2 = SESSION.post(API_URL, data=payload2)
         response2.raise_for_status()
         
         data2 = response2.json()